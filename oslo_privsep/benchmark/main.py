@@ -0,0 +1,334 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmarks of privsep round-trip latency and throughput.
+
+The benchmarks start an unprivileged privsep daemon with the "fork"
+method, like the UnprivilegedPrivsepFixture used by tests, so they can
+be run by any user.  Results are printed as JSON so that they can be
+compared between releases::
+
+    privsep-bench --scenario latency --scenario payload > results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections.abc import Callable
+from collections.abc import Iterator
+import contextlib
+import datetime
+import importlib.metadata
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from typing import Any
+
+from oslo_config import cfg
+from oslo_log import log as oslo_logging
+
+from oslo_privsep.benchmark import privileged
+from oslo_privsep import priv_context
+
+LOG = logging.getLogger(__name__)
+
+KiB = 1024
+MiB = 1024 * KiB
+
+DEFAULT_THREADS = [1, 2, 4, 8, 16]
+DEFAULT_POOL_SIZES = [1, 4, 16]
+DEFAULT_PAYLOAD_SIZES = [1, KiB, 64 * KiB, MiB, 10 * MiB, 50 * MiB]
+# Upper bound on the bytes moved per payload size, so that large payloads
+# do not take forever.
+PAYLOAD_BUDGET = 256 * MiB
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    """Return the q-th percentile of already sorted samples."""
+    return samples[round(q / 100 * (len(samples) - 1))]
+
+
+def summarize(samples: list[float]) -> dict[str, Any]:
+    """Summarize call durations, given in seconds, in microseconds."""
+    samples = sorted(samples)
+    return {
+        'count': len(samples),
+        'mean_us': sum(samples) / len(samples) * 1e6,
+        'min_us': samples[0] * 1e6,
+        'p50_us': _percentile(samples, 50) * 1e6,
+        'p99_us': _percentile(samples, 99) * 1e6,
+        'max_us': samples[-1] * 1e6,
+    }
+
+
+def time_calls(
+    func: Callable[..., Any], args: tuple[Any, ...], iterations: int
+) -> list[float]:
+    """Call func(*args) iterations times and return each call's duration."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        try:
+            func(*args)
+        except privileged.BenchError:
+            pass
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@contextlib.contextmanager
+def daemon(**overrides: Any) -> Iterator[None]:
+    """Run an unprivileged privsep daemon for the benchmark context."""
+    context = privileged.bench_context
+    overrides.setdefault('capabilities', [])
+    overrides.setdefault('user', None)
+    overrides.setdefault('group', None)
+    for k, v in overrides.items():
+        cfg.CONF.set_override(k, v, group=context.cfg_section)
+
+    orig_pid = os.getpid()
+    try:
+        context.start(method=priv_context.Method.FORK)
+    except Exception:
+        # Do not let the forked daemon carry on running the benchmarks.
+        if os.getpid() == orig_pid:
+            raise
+        LOG.exception('privsep benchmark daemon failed')
+        os._exit(1)
+
+    try:
+        yield
+    finally:
+        context.stop()
+        for k in overrides:
+            cfg.CONF.clear_override(k, group=context.cfg_section)
+
+
+def bench_latency(iterations: int) -> dict[str, Any]:
+    """Latency of calls doing nothing."""
+    with daemon():
+        time_calls(privileged.noop, (), min(iterations, 100))  # warm up
+        return summarize(time_calls(privileged.noop, (), iterations))
+
+
+def _throughput(threads: int, iterations: int) -> float:
+    """Return the rate of calls completed by concurrent callers."""
+    per_thread = max(1, iterations // threads)
+    barrier = threading.Barrier(threads + 1)
+
+    def caller() -> None:
+        barrier.wait()
+        for _ in range(per_thread):
+            privileged.noop()
+
+    workers = [threading.Thread(target=caller) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def bench_throughput(
+    iterations: int, threads: list[int], pool_sizes: list[int]
+) -> list[dict[str, Any]]:
+    """Throughput against caller thread count and thread_pool_size."""
+    results = []
+    for pool_size in pool_sizes:
+        with daemon(thread_pool_size=pool_size):
+            for n in threads:
+                results.append(
+                    {
+                        'thread_pool_size': pool_size,
+                        'threads': n,
+                        'calls_per_second': _throughput(n, iterations),
+                    }
+                )
+    return results
+
+
+def bench_payload(iterations: int, sizes: list[int]) -> list[dict[str, Any]]:
+    """Latency against payload size, sent to and returned by the daemon."""
+    results = []
+    with daemon():
+        for size in sizes:
+            n = max(1, min(iterations, PAYLOAD_BUDGET // size))
+            payload = b'\0' * size
+            for direction, func, arg in (
+                ('request', privileged.consume, payload),
+                ('reply', privileged.produce, size),
+            ):
+                result = summarize(time_calls(func, (arg,), n))
+                result['direction'] = direction
+                result['size'] = size
+                result['mib_per_second'] = (
+                    size / MiB / (result['mean_us'] / 1e6)
+                )
+                results.append(result)
+    return results
+
+
+def bench_exception(iterations: int) -> dict[str, Any]:
+    """Cost of calls raising an exception, compared to successful ones."""
+    with daemon():
+        ok = summarize(time_calls(privileged.noop, (), iterations))
+        error = summarize(time_calls(privileged.fail, (), iterations))
+    return {
+        'success': ok,
+        'exception': error,
+        'overhead_us': error['p50_us'] - ok['p50_us'],
+    }
+
+
+def bench_logging(iterations: int, records: int = 10) -> dict[str, Any]:
+    """Cost of forwarding daemon log records to the client."""
+    # Handle forwarded records without actually writing them anywhere.
+    client_log = oslo_logging.getLogger(
+        privileged.bench_context.conf.logger_name
+    ).logger
+    handler = logging.NullHandler()
+    client_log.addHandler(handler)
+    propagate, client_log.propagate = client_log.propagate, False
+    try:
+        with daemon():
+            quiet = summarize(
+                time_calls(privileged.emit_logs, (0,), iterations)
+            )
+            noisy = summarize(
+                time_calls(privileged.emit_logs, (records,), iterations)
+            )
+    finally:
+        client_log.propagate = propagate
+        client_log.removeHandler(handler)
+    return {
+        'records_per_call': records,
+        'no_records': quiet,
+        'with_records': noisy,
+        'per_record_us': (noisy['p50_us'] - quiet['p50_us']) / records,
+    }
+
+
+SCENARIOS = ('latency', 'throughput', 'payload', 'exception', 'logging')
+
+
+def run(
+    scenarios: list[str],
+    iterations: int,
+    threads: list[int] | None = None,
+    pool_sizes: list[int] | None = None,
+    payload_sizes: list[int] | None = None,
+) -> dict[str, Any]:
+    """Run the given benchmark scenarios and return their results."""
+    try:
+        version = importlib.metadata.version('oslo.privsep')
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+
+    results: dict[str, Any] = {}
+    for scenario in scenarios:
+        if scenario == 'latency':
+            results[scenario] = bench_latency(iterations)
+        elif scenario == 'throughput':
+            results[scenario] = bench_throughput(
+                iterations,
+                threads or DEFAULT_THREADS,
+                pool_sizes or DEFAULT_POOL_SIZES,
+            )
+        elif scenario == 'payload':
+            results[scenario] = bench_payload(
+                iterations, payload_sizes or DEFAULT_PAYLOAD_SIZES
+            )
+        elif scenario == 'exception':
+            results[scenario] = bench_exception(iterations)
+        elif scenario == 'logging':
+            results[scenario] = bench_logging(iterations)
+        else:
+            raise ValueError(f'Unknown scenario: {scenario}')
+
+    return {
+        'version': version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now(datetime.UTC).isoformat(),
+        'iterations': iterations,
+        'results': results,
+    }
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(',')]
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Entry point of the privsep-bench command."""
+    parser = argparse.ArgumentParser(
+        prog='privsep-bench',
+        description='Benchmark privsep round-trip latency and throughput.',
+    )
+    parser.add_argument(
+        '--scenario',
+        action='append',
+        choices=SCENARIOS,
+        help='Scenario to run, may be repeated. Defaults to all of them.',
+    )
+    parser.add_argument(
+        '--iterations',
+        type=int,
+        default=1000,
+        help='Number of calls per measurement.',
+    )
+    parser.add_argument(
+        '--threads',
+        type=_int_list,
+        help='Comma separated caller thread counts for throughput.',
+    )
+    parser.add_argument(
+        '--pool-sizes',
+        type=_int_list,
+        help='Comma separated thread_pool_size values for throughput.',
+    )
+    parser.add_argument(
+        '--payload-sizes',
+        type=_int_list,
+        help='Comma separated payload sizes in bytes.',
+    )
+    parser.add_argument(
+        '--output',
+        help='File to write the JSON results to, instead of stdout.',
+    )
+    args = parser.parse_args(argv)
+
+    cfg.CONF(args=[], project='privsep-bench', default_config_files=[])
+
+    results = run(
+        args.scenario or list(SCENARIOS),
+        args.iterations,
+        threads=args.threads,
+        pool_sizes=args.pool_sizes,
+        payload_sizes=args.payload_sizes,
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
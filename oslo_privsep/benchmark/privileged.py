@@ -0,0 +1,57 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Privileged context and entrypoints exercised by the benchmarks."""
+
+import logging
+
+from oslo_privsep import priv_context
+
+LOG = logging.getLogger(__name__)
+
+bench_context = priv_context.PrivContext(
+    __name__,
+    cfg_section='privsep_bench',
+    pypath=__name__ + '.bench_context',
+    # The benchmarks measure privsep itself, no actual powers needed.
+    capabilities=[],
+)
+
+
+class BenchError(Exception):
+    pass
+
+
+@bench_context.entrypoint
+def noop() -> None:
+    pass
+
+
+@bench_context.entrypoint
+def consume(payload: bytes) -> int:
+    return len(payload)
+
+
+@bench_context.entrypoint
+def produce(size: int) -> bytes:
+    return b'\0' * size
+
+
+@bench_context.entrypoint
+def fail() -> None:
+    raise BenchError('failed on purpose')
+
+
+@bench_context.entrypoint
+def emit_logs(count: int) -> None:
+    for i in range(count):
+        LOG.warning('privsep benchmark log record %d', i)
@@ -49,21 +49,32 @@ class Message(enum.IntEnum):
     RET = 4
     ERR = 5
     LOG = 6
+    PROFILE = 7
 
 
 class PrivsepTimeout(Exception):
     pass
 
 
+class MessageStats:
+    """Serialized sizes of a request and its reply, in bytes."""
+
+    def __init__(self) -> None:
+        self.request_size = 0
+        self.reply_size = 0
+
+
 class Serializer:
     def __init__(self, writesock: socket.socket) -> None:
         self.writesock = writesock
 
-    def send(self, msg: Any) -> None:
+    def send(self, msg: Any) -> int:
+        """Send a message and return its serialized size."""
         buf = msgpack.packb(
             msg, use_bin_type=True, unicode_errors='surrogateescape'
         )
         self.writesock.sendall(buf)
+        return len(buf)
 
     def close(self) -> None:
         # Hilarious. `socket._socketobject.close()` doesn't actually
@@ -84,6 +95,9 @@ class Deserializer:
             # < 1.0.0
             max_buffer_size=100 * 1024 * 1024,
         )
+        # Serialized size of the most recently returned message
+        self.last_size = 0
+        self._offset = 0
 
     def __iter__(self) -> Self:
         return self
@@ -91,7 +105,11 @@ class Deserializer:
     def __next__(self) -> Any:
         while True:
             try:
-                return next(self.unpacker)
+                msg = next(self.unpacker)
+                offset = self.unpacker.tell()
+                self.last_size = offset - self._offset
+                self._offset = offset
+                return msg
             except StopIteration:
                 try:
                     buf = self.readsock.recv(4096)
@@ -111,11 +129,13 @@ class Future:
         self.condvar = threading.Condition(lock)
         self.error: BaseException | None = None
         self.data: Any = None
+        self.size = 0
         self.timeout = timeout
 
-    def set_result(self, data: Any) -> None:
+    def set_result(self, data: Any, size: int = 0) -> None:
         """Must already be holding lock used in constructor"""
         self.data = data
+        self.size = size
         self.condvar.notify()
 
     def set_exception(self, exc: BaseException) -> None:
@@ -175,7 +195,9 @@ class ClientChannel:
                             "possible that timeout is reached!"
                         )
                         continue
-                    self.outstanding_msgs[msgid].set_result(data)
+                    self.outstanding_msgs[msgid].set_result(
+                        data, reader.last_size
+                    )
 
         # EOF.  Perhaps the privileged process exited?
         # Send an IOError to any oustanding waiting readers.  Assuming
@@ -193,7 +215,12 @@ class ClientChannel:
         """Received OOB message. Subclasses might want to override this."""
         pass
 
-    def send_recv(self, msg: Any, timeout: float | None = None) -> Any:
+    def send_recv(
+        self,
+        msg: Any,
+        timeout: float | None = None,
+        stats: MessageStats | None = None,
+    ) -> Any:
         myid = uuidutils.generate_uuid()
         while myid in self.outstanding_msgs:
             LOG.warning("myid shoudn't be in outstanding_msgs.")
@@ -203,9 +230,12 @@ class ClientChannel:
         with self.lock:
             self.outstanding_msgs[myid] = future
             try:
-                self.writer.send((myid, msg))
+                size = self.writer.send((myid, msg))
 
                 reply = future.result()
+                if stats is not None:
+                    stats.request_size = size
+                    stats.reply_size = future.size
             except Exception:
                 LOG.warning("Unexpected error: %s", sys.exc_info()[0])
                 raise
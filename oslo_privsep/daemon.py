@@ -53,11 +53,13 @@ import errno
 import logging as pylogging
 import os
 import platform
+import reprlib
 import socket
 import subprocess
 import sys
 import tempfile
 import threading
+import time
 import traceback
 from typing import Any
 from typing import TYPE_CHECKING
@@ -67,6 +69,7 @@ from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import encodeutils
 from oslo_utils import importutils
+from oslo_utils import strutils
 
 from oslo_privsep._i18n import _
 from oslo_privsep import capabilities
@@ -82,6 +85,9 @@ if platform.system() == 'Linux':
 
 LOG = logging.getLogger(__name__)
 
+# Per worker thread state of the privileged call being executed
+_CALL_STATE = threading.local()
+
 
 EVENTLET_MODULES: tuple[str, ...] = (
     'os',
@@ -181,6 +187,52 @@ def setgid(group_id_or_name: str | int) -> None:
             raise FailedToDropPrivileges(msg)
 
 
+def get_trace_context() -> Any:
+    """Return the trace context sent with the current privileged call.
+
+    Only meaningful inside the daemon, while executing an entrypoint.
+    Returns None if the caller did not provide a trace context.
+    """
+    return getattr(_CALL_STATE, 'trace', None)
+
+
+def sample_stacks(duration: float, interval: float) -> dict[str, int]:
+    """Sample the stacks of all threads of this process.
+
+    Every ``interval`` seconds for ``duration`` seconds, the current stack
+    of each thread (other than the calling one) is recorded.
+
+    :returns: A mapping of stacks in "collapsed" format, as consumed by
+              flamegraph tools (thread name and frames from outermost to
+              innermost separated by semicolons), to the number of times
+              each was sampled.
+    """
+    me = threading.get_ident()
+    stacks: dict[str, int] = {}
+    deadline = time.monotonic() + duration
+    while True:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            frames = []
+            f: Any = frame
+            while f is not None:
+                code = f.f_code
+                frames.append(
+                    f'{code.co_name} ({code.co_filename}:{f.f_lineno})'
+                )
+                f = f.f_back
+            frames.append(names.get(ident, str(ident)))
+            key = ';'.join(reversed(frames))
+            stacks[key] = stacks.get(key, 0) + 1
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(interval, remaining))
+    return stacks
+
+
 class PrivsepLogHandler(pylogging.Handler):
     def __init__(
         self,
@@ -244,18 +296,30 @@ class _ClientChannel(comm.ClientChannel):
         args: tuple[Any, ...],
         kwargs: dict[str, Any],
         timeout: float | None,
+        info: priv_context.CallInfo | None = None,
+        options: dict[str, Any] | None = None,
     ) -> Any:
-        result = self.send_recv(
-            (comm.Message.CALL.value, name, args, kwargs), timeout
+        request: tuple[Any, ...] = (
+            comm.Message.CALL.value,
+            name,
+            args,
+            kwargs,
         )
+        if options:
+            request += (options,)
+        result = self.send_recv(request, timeout, info)
         if result[0] == comm.Message.RET:
-            # (RET, return value)
+            # (RET, return value[, meta])
+            if info is not None and len(result) > 2:
+                info.set_daemon_meta(result[2])
             return result[1]
         elif result[0] == comm.Message.ERR:
-            # (ERR, exc_type, args)
+            # (ERR, exc_type, args[, traceback[, meta]])
             #
             # TODO(gus): see what can be done to preserve traceback
             # (without leaking local values)
+            if info is not None and len(result) > 4:
+                info.set_daemon_meta(result[4])
             exc_type = importutils.import_class(result[1])
             if self.log_traceback:
                 try:
@@ -267,6 +331,18 @@ class _ClientChannel(comm.ClientChannel):
         else:
             raise ProtocolError(_('Unexpected response: %r') % result)
 
+    def profile(self, duration: float, interval: float) -> dict[str, int]:
+        result = self.send_recv(
+            (comm.Message.PROFILE.value, duration, interval)
+        )
+        if result[0] == comm.Message.RET:
+            return dict(result[1])
+        elif result[0] == comm.Message.ERR:
+            exc_type = importutils.import_class(result[1])
+            raise exc_type(*result[2])
+        else:
+            raise ProtocolError(_('Unexpected response: %r') % result)
+
     def out_of_band(self, msg: Any) -> None:
         if msg[0] == comm.Message.LOG:
             # (LOG, LogRecord __dict__)
@@ -383,59 +459,191 @@ class ForkingClientChannel(_ClientChannel):
         super().__init__(sock_a, context)
 
 
-class RootwrapClientChannel(_ClientChannel):
-    def __init__(self, context: priv_context.PrivContext) -> None:
-        """Start privsep daemon using exec()
+def spawn_helper(
+    contexts: list[priv_context.PrivContext],
+) -> list[socket.socket]:
+    """Start a privsep helper serving the given contexts via sudo/rootwrap.
 
-        Uses sudo/rootwrap to gain privileges.
-        """
-
-        listen_sock = socket.socket(socket.AF_UNIX)
+    A single helper command is run for all the contexts, which must thus
+    share the same helper command.  The helper forks a separate daemon
+    for each of them.
 
-        # Note we listen() on the unprivileged side, and connect to it
-        # from the privileged process.  This means there is no exposed
-        # attack point on the privileged side.
+    :returns: The socket connected to the daemon of each context.
+    """
+    # Note we listen() on the unprivileged side, and connect to it
+    # from the privileged process.  This means there is no exposed
+    # attack point on the privileged side.
 
-        # NB: Permissions on sockets are not checked on some (BSD) Unices
-        # so create socket in a private directory for safety.  Privsep
-        # daemon will (initially) be running as root, so will still be
-        # able to connect to sock path.
-        tmpdir = tempfile.mkdtemp()  # NB: created with 0700 perms
+    # NB: Permissions on sockets are not checked on some (BSD) Unices
+    # so create socket in a private directory for safety.  Privsep
+    # daemon will (initially) be running as root, so will still be
+    # able to connect to sock path.
+    tmpdir = tempfile.mkdtemp()  # NB: created with 0700 perms
 
-        try:
-            sockpath = os.path.join(tmpdir, 'privsep.sock')
+    listen_socks: list[tuple[socket.socket, str]] = []
+    try:
+        cmd: list[str] = []
+        for i, context in enumerate(contexts):
+            sockpath = os.path.join(
+                tmpdir, f'privsep{i}.sock' if i else 'privsep.sock'
+            )
+            listen_sock = socket.socket(socket.AF_UNIX)
+            listen_socks.append((listen_sock, sockpath))
             listen_sock.bind(sockpath)
             listen_sock.listen(1)
 
-            cmd = context.helper_command(sockpath)
-            LOG.info('Running privsep helper: %s', cmd)
-            proc = subprocess.Popen(  # noqa: S603
-                cmd, shell=False, stderr=_fd_logger()
-            )
-            if proc.wait() != 0:
-                msg = (
-                    f'privsep helper command exited non-zero '
-                    f'({proc.returncode})'
+            context_cmd = context.helper_command(sockpath)
+            if not cmd:
+                cmd = context_cmd
+            elif context_cmd[:-4] != cmd[:-4]:
+                raise ValueError(
+                    f'{context!r} does not use the same helper command '
+                    f'as {contexts[0]!r}'
                 )
-                LOG.critical(msg)
-                raise FailedToDropPrivileges(msg)
-            LOG.info('Spawned new privsep daemon via rootwrap')
+            else:
+                # Only append the --privsep_context and
+                # --privsep_sock_path arguments
+                cmd.extend(context_cmd[-4:])
+
+        LOG.info('Running privsep helper: %s', cmd)
+        proc = subprocess.Popen(  # noqa: S603
+            cmd, shell=False, stderr=_fd_logger()
+        )
+        if proc.wait() != 0:
+            msg = f'privsep helper command exited non-zero ({proc.returncode})'
+            LOG.critical(msg)
+            raise FailedToDropPrivileges(msg)
+        LOG.info('Spawned new privsep daemon via rootwrap')
 
+        socks = []
+        for listen_sock, sockpath in listen_socks:
             sock, _addr = listen_sock.accept()
             LOG.debug('Accepted privsep connection to %s', sockpath)
+            socks.append(sock)
 
-        finally:
-            # Don't need listen_sock anymore, so clean up.
+    finally:
+        # Don't need listen_sock anymore, so clean up.
+        for listen_sock, sockpath in listen_socks:
             listen_sock.close()
             try:
                 os.unlink(sockpath)
             except OSError as e:
                 if e.errno != errno.ENOENT:
                     raise
-            os.rmdir(tmpdir)
+        os.rmdir(tmpdir)
+
+    return socks
+
+
+class RootwrapClientChannel(_ClientChannel):
+    def __init__(
+        self,
+        context: priv_context.PrivContext,
+        sock: socket.socket | None = None,
+    ) -> None:
+        """Start privsep daemon using exec()
+
+        Uses sudo/rootwrap to gain privileges.
+
+        :param sock: Socket connected to an already spawned daemon, see
+            :meth:`start_many`.
+        """
+        if sock is None:
+            (sock,) = spawn_helper([context])
 
         super().__init__(sock, context)
 
+    @classmethod
+    def start_many(
+        cls, contexts: list[priv_context.PrivContext]
+    ) -> list[RootwrapClientChannel]:
+        """Start daemons for several contexts with one helper command."""
+        socks = spawn_helper(contexts)
+        channels: list[RootwrapClientChannel] = []
+        try:
+            for context, sock in zip(contexts, socks):
+                channels.append(cls(context, sock=sock))
+        except Exception:
+            for channel in channels:
+                channel.close()
+            for sock in socks[len(channels) :]:
+                sock.close()
+            raise
+        return channels
+
+
+class _SlowCallDetector:
+    """Logs privileged calls exceeding a run time threshold.
+
+    Warnings are rate limited per entrypoint: at most one is logged per
+    ``interval`` seconds, and the number of suppressed slow calls is
+    reported with the next one.
+    """
+
+    def __init__(
+        self,
+        threshold: float | None,
+        overrides: dict[str, float],
+        interval: float,
+    ) -> None:
+        self.threshold = threshold
+        self.overrides = overrides
+        self.interval = interval
+        self.lock = threading.Lock()
+        # name -> (time last logged, number of suppressed warnings)
+        self.logged: dict[str, tuple[float, int]] = {}
+        self.repr = reprlib.Repr()
+        self.repr.maxstring = 64
+        self.repr.maxother = 64
+        self.repr.maxlevel = 3
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.threshold) or bool(self.overrides)
+
+    def summarize(self, args: tuple[Any, ...], kwargs: dict[str, Any]) -> str:
+        """Return a truncated summary of call arguments, secrets masked."""
+        args = tuple(
+            strutils.mask_password(a) if isinstance(a, str) else a
+            for a in args
+        )
+        kwargs = strutils.mask_dict_password(kwargs)
+        return f'args={self.repr.repr(args)} kwargs={self.repr.repr(kwargs)}'
+
+    def check(
+        self,
+        name: str,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+        wait: float,
+        run: float,
+    ) -> None:
+        threshold = self.overrides.get(name, self.threshold)
+        if not threshold or run < threshold:
+            return
+
+        now = time.monotonic()
+        with self.lock:
+            last, suppressed = self.logged.get(name, (None, 0))
+            if last is not None and now - last < self.interval:
+                self.logged[name] = (last, suppressed + 1)
+                return
+            self.logged[name] = (now, 0)
+
+        LOG.warning(
+            'Slow privsep call %(name)s: run time %(run).3fs, queue wait '
+            '%(wait).3fs, threshold %(threshold).3fs, %(suppressed)d '
+            'similar warnings suppressed, %(summary)s',
+            {
+                'name': name,
+                'run': run,
+                'wait': wait,
+                'threshold': threshold,
+                'suppressed': suppressed,
+                'summary': self.summarize(args, kwargs),
+            },
+        )
+
 
 class Daemon:
     """NB: This doesn't fork() - do that yourself before calling run()"""
@@ -454,6 +662,11 @@ class Daemon:
             context.conf.thread_pool_size
         )
         self.communication_error: BaseException | None = None
+        self.slow_calls = _SlowCallDetector(
+            context.conf.slow_call_threshold,
+            context.conf.slow_call_thresholds,
+            context.conf.slow_call_log_interval,
+        )
 
     def run(self) -> None:
         """Run request loop. Sets up environment, then calls loop()"""
@@ -516,7 +729,12 @@ class Daemon:
         )
 
     def _process_cmd(
-        self, msgid: str, cmd: comm.Message, *args: Any
+        self,
+        msgid: str,
+        cmd: comm.Message,
+        *args: Any,
+        received: float | None = None,
+        meta: dict[str, Any] | None = None,
     ) -> tuple[Any, ...]:
         """Executes the requested command in an execution thread.
 
@@ -525,26 +743,51 @@ class Daemon:
 
         :param msgid: The message identifier.
         :param cmd: The `Message` type indicating the command type.
-        :param args: The function, args, and kwargs if a Message.CALL type.
+        :param args: The function, args, kwargs and optional call options if
+                     a Message.CALL type.
+        :param received: The time at which the command was received.
+        :param meta: Call metadata to be returned to the client, or None if
+                     the client did not ask for it.
         :return: A tuple of the return status, optional call output, and
                  optional error information.
         """
         if cmd == comm.Message.PING:
             return (comm.Message.PONG.value,)
 
+        dequeued = time.time()
+        if meta is not None:
+            meta['phases']['dequeued'] = dequeued
+        extra: tuple[Any, ...] = (meta,) if meta is not None else ()
+
         try:
             if cmd != comm.Message.CALL:
                 raise ProtocolError(_('Unknown privsep cmd: %s') % cmd)
 
             # Extract the callable and arguments
-            name, f_args, f_kwargs = args
+            name, f_args, f_kwargs = args[:3]
+            options = args[3] if len(args) > 3 else {}
             func = importutils.import_class(name)
             if not self.context.is_entrypoint(func):
                 msg = _('Invalid privsep function: %s not exported') % name
                 raise NameError(msg)
 
-            ret = func(*f_args, **f_kwargs)
-            return (comm.Message.RET.value, ret)
+            _CALL_STATE.trace = options.get('trace')
+            try:
+                ret = func(*f_args, **f_kwargs)
+            finally:
+                _CALL_STATE.trace = None
+                executed = time.time()
+                if meta is not None:
+                    meta['phases']['executed'] = executed
+                if self.slow_calls.enabled:
+                    self.slow_calls.check(
+                        name,
+                        f_args,
+                        f_kwargs,
+                        dequeued - (received or dequeued),
+                        executed - dequeued,
+                    )
+            return (comm.Message.RET.value, ret) + extra
         except Exception as e:
             LOG.debug(
                 'privsep: Exception during request[%(msgid)s]: %(err)s',
@@ -558,14 +801,15 @@ class Daemon:
                 cls_name,
                 e.args,
                 traceback.format_exc(),
-            )
+            ) + extra
 
     def _create_done_callback(
-        self, msgid: str
+        self, msgid: str, meta: dict[str, Any] | None = None
     ) -> Callable[[futures.Future[tuple[Any, ...]]], None]:
         """Creates a future callback to receive command execution results.
 
         :param msgid: The message identifier.
+        :param meta: Call metadata included in the reply, if any.
         :return: A future reply callback.
         """
         channel = self.channel
@@ -581,6 +825,8 @@ class Daemon:
                     'privsep: reply[%(msgid)s]: %(reply)s',
                     {'msgid': msgid, 'reply': reply},
                 )
+                if meta is not None:
+                    meta['phases']['replied'] = time.time()
                 channel.send((msgid, reply))
             except OSError:
                 self.communication_error = sys.exc_info()[1]
@@ -605,6 +851,26 @@ class Daemon:
 
         return _call_back
 
+    def _profile(self, msgid: str, duration: float, interval: float) -> None:
+        """Profile the daemon and send the collected stacks as reply."""
+        reply: tuple[Any, ...]
+        try:
+            LOG.info('Profiling privsep daemon for %s seconds', duration)
+            stacks = sample_stacks(duration, interval)
+            reply = (comm.Message.RET.value, stacks)
+        except Exception as e:
+            cls = e.__class__
+            reply = (
+                comm.Message.ERR.value,
+                f'{cls.__module__}.{cls.__name__}',
+                e.args,
+                traceback.format_exc(),
+            )
+        try:
+            self.channel.send((msgid, reply))
+        except OSError as exc:
+            self.communication_error = exc
+
     def loop(self) -> None:
         """Main body of daemon request loop"""
         LOG.info('privsep daemon running as pid %s', os.getpid())
@@ -614,6 +880,7 @@ class Daemon:
         self.context.set_client_mode(False)
 
         for msgid, msg in self.channel:
+            received = time.time()
             error = self.communication_error
             if error:
                 if getattr(error, 'errno', None) == errno.EPIPE:
@@ -621,20 +888,45 @@ class Daemon:
                     break
                 raise error
 
+            if msg[0] == comm.Message.PROFILE:
+                # Profile in a dedicated thread, so that it is possible
+                # even while all the workers are busy.
+                threading.Thread(
+                    name='privsep_profiler',
+                    target=self._profile,
+                    args=(msgid, *msg[1:]),
+                    daemon=True,
+                ).start()
+                continue
+
+            # Clients ask for call metadata through the optional options
+            # dict trailing a CALL message.
+            meta = None
+            if msg[0] == comm.Message.CALL and len(msg) > 4:
+                if msg[4].get('timing'):
+                    meta = {'phases': {'received': received}}
+
             # Submit the command for execution
-            future = self.thread_pool.submit(self._process_cmd, msgid, *msg)
-            future.add_done_callback(self._create_done_callback(msgid))
+            future = self.thread_pool.submit(
+                self._process_cmd, msgid, *msg, received=received, meta=meta
+            )
+            future.add_done_callback(self._create_done_callback(msgid, meta))
 
         LOG.debug('Socket closed, shutting down privsep daemon')
 
 
 def helper_main() -> None:
-    """Start privileged process, serving requests over a Unix socket."""
+    """Start privileged process, serving requests over a Unix socket.
+
+    Several contexts can be served by a single helper by repeating the
+    --privsep_context and --privsep_sock_path arguments, in which case a
+    daemon is forked for each context once they are all imported.
+    """
 
     cfg.CONF.register_cli_opts(
         [
-            cfg.StrOpt('privsep_context', required=True),
-            cfg.StrOpt('privsep_sock_path', required=True),
+            cfg.MultiStrOpt('privsep_context', required=True),
+            cfg.MultiStrOpt('privsep_sock_path', required=True),
         ]
     )
 
@@ -644,26 +936,52 @@ def helper_main() -> None:
     # note replace_logging call below
     logging.setup(cfg.CONF, 'privsep', fix_eventlet=False)
 
-    context = importutils.import_class(cfg.CONF.privsep_context)
+    if len(cfg.CONF.privsep_context) != len(cfg.CONF.privsep_sock_path):
+        msg = (
+            'There must be as many --privsep_sock_path as '
+            '--privsep_context arguments'
+        )
+        LOG.critical(msg)
+        sys.exit(msg)
+
     from oslo_privsep import priv_context as priv_context_mod  # Avoid circular
 
-    if not isinstance(context, priv_context_mod.PrivContext):
-        LOG.critical(
-            '--privsep_context must be the (python) name of a '
-            'PrivContext object'
-        )
+    contexts = []
+    for pypath in cfg.CONF.privsep_context:
+        context = importutils.import_class(pypath)
+        if not isinstance(context, priv_context_mod.PrivContext):
+            LOG.critical(
+                '--privsep_context must be the (python) name of a '
+                'PrivContext object'
+            )
+        contexts.append(context)
+
+    socks = []
+    for sock_path in cfg.CONF.privsep_sock_path:
+        sock = socket.socket(socket.AF_UNIX)
+        sock.connect(sock_path)
+        set_cloexec(sock)
+        socks.append(sock)
+
+    # Channels are set up, so fork off daemons "in the background" and exit.
+    # Everything imported so far is shared copy-on-write by the daemons.
+    for i, context in enumerate(contexts):
+        if os.fork() == 0:
+            # child
+            for j, sock in enumerate(socks):
+                if j != i:
+                    sock.close()
+            _daemon_main(comm.ServerChannel(socks[i]), context)
 
-    sock = socket.socket(socket.AF_UNIX)
-    sock.connect(cfg.CONF.privsep_sock_path)
-    set_cloexec(sock)
-    channel = comm.ServerChannel(sock)
+    # parent
+    for sock in socks:
+        sock.close()
 
-    # Channel is set up, so fork off daemon "in the background" and exit
-    if os.fork() != 0:
-        # parent
-        return
 
-    # child
+def _daemon_main(
+    channel: comm.ServerChannel, context: priv_context.PrivContext
+) -> None:
+    """Run a daemon forked by helper_main, then exit."""
 
     # Note we don't move into a new process group/session like a
     # regular daemon might, since we _want_ to remain associated with
@@ -16,6 +16,7 @@ from __future__ import annotations
 
 from collections.abc import Callable
 from collections.abc import Iterable
+from concurrent import futures
 import copy
 import enum
 import functools
@@ -23,7 +24,9 @@ import logging
 import multiprocessing
 import shlex
 import threading
+import time
 from typing import Any
+import weakref
 
 from oslo_config import cfg
 from oslo_config import types
@@ -31,6 +34,7 @@ from oslo_utils import importutils
 
 from oslo_privsep._i18n import _
 from oslo_privsep import capabilities
+from oslo_privsep import comm
 from oslo_privsep import daemon
 
 
@@ -102,10 +106,44 @@ OPTS = [
         ),
         default=False,
     ),
+    cfg.FloatOpt(
+        'slow_call_threshold',
+        min=0,
+        help=_(
+            'Log a warning from the privsep daemon when a privileged '
+            'call runs for longer than this number of seconds.  The '
+            'warning includes a truncated summary of the call '
+            'arguments with secrets masked.  Unset or 0 disables it.'
+        ),
+    ),
+    cfg.Opt(
+        'slow_call_thresholds',
+        type=types.Dict(value_type=types.Float(min=0)),
+        default={},
+        help=_(
+            'Per entrypoint overrides of slow_call_threshold, as a '
+            'mapping of fully qualified entrypoint names to a number of '
+            'seconds.  A value of 0 disables the warning for that '
+            'entrypoint.'
+        ),
+    ),
+    cfg.FloatOpt(
+        'slow_call_log_interval',
+        min=0,
+        default=60.0,
+        help=_(
+            'Minimum number of seconds between two slow call warnings '
+            'for the same entrypoint.  Warnings raised in between are '
+            'counted and the count reported with the next warning.'
+        ),
+    ),
 ]
 
 _ENTRYPOINT_ATTR = 'privsep_entrypoint'
 _HELPER_COMMAND_PREFIX = ['sudo']
+_TRACE_PROVIDER: Callable[[], Any] | None = None
+# All the contexts created in this process, for start_all()
+_CONTEXTS: weakref.WeakSet[PrivContext] = weakref.WeakSet()
 
 
 def _list_opts() -> list[tuple[cfg.OptGroup, list[cfg.Opt]]]:
@@ -142,6 +180,52 @@ class Method(enum.Enum):
     ROOTWRAP = 2
 
 
+@enum.unique
+class Outcome(enum.Enum):
+    SUCCESS = 'success'
+    ERROR = 'error'
+    TIMEOUT = 'timeout'
+
+
+class CallInfo(comm.MessageStats):
+    """Details of a single privileged call, as passed to call hooks.
+
+    Pre-call hooks only see ``name``, ``context``, ``start_time`` and
+    ``trace_context``; the remaining attributes are filled in before
+    post-call hooks run.
+
+    ``daemon_phases`` maps the daemon side phases of the call
+    (``received``, ``dequeued``, ``executed`` and ``replied``) to the
+    wall-clock time at which each was reached.
+    """
+
+    def __init__(
+        self, context: PrivContext, name: str, trace_context: Any = None
+    ) -> None:
+        super().__init__()
+        self.context = context
+        self.name = name
+        self.trace_context = trace_context
+        self.start_time = time.time()
+        self.elapsed = 0.0
+        self.outcome: Outcome | None = None
+        self.exception: BaseException | None = None
+        self.daemon_phases: dict[str, float] = {}
+
+    def set_daemon_meta(self, meta: dict[str, Any]) -> None:
+        """Record call metadata returned by the daemon."""
+        self.daemon_phases = dict(meta.get('phases', {}))
+
+    def __repr__(self) -> str:
+        return (
+            f'CallInfo(name={self.name}, elapsed={self.elapsed:.6f}, '
+            f'outcome={self.outcome})'
+        )
+
+
+CallHook = Callable[[CallInfo], None]
+
+
 def init(root_helper: list[str] | None = None) -> None:
     """Initialise oslo.privsep library.
 
@@ -160,6 +244,144 @@ def init(root_helper: list[str] | None = None) -> None:
         _HELPER_COMMAND_PREFIX = root_helper
 
 
+def set_trace_provider(provider: Callable[[], Any] | None) -> None:
+    """Set the callable providing trace context for privileged calls.
+
+    The provider is called on the calling thread before each privileged
+    call and should return the current trace/span context (for example a
+    dict of W3C ``traceparent`` headers), or None.  The value must be
+    serializable by privsep.  It is sent along with the call, made
+    available in the daemon via :func:`oslo_privsep.daemon.get_trace_context`
+    and passed to call hooks as ``CallInfo.trace_context``.
+
+    :param provider: The provider, or None to stop propagating context.
+    """
+    global _TRACE_PROVIDER
+    _TRACE_PROVIDER = provider
+
+
+def _get_trace_context() -> Any:
+    if _TRACE_PROVIDER is None:
+        return None
+    try:
+        return _TRACE_PROVIDER()
+    except Exception:
+        LOG.exception('Error in privsep trace provider')
+        return None
+
+
+def _wait_all(starts: list[futures.Future[None]]) -> None:
+    futures.wait(starts)
+    for f in starts:
+        f.result()
+
+
+def start_all(
+    method: Method = Method.ROOTWRAP,
+    wait: bool = True,
+    share_helper: bool = False,
+) -> list[futures.Future[None]]:
+    """Start the daemons of all the contexts in parallel.
+
+    Contexts that are not in client mode, already running, or (with
+    the rootwrap method) have no ``pypath`` are skipped.
+
+    :param method: The method used to start the daemons.
+    :param wait: Whether to wait for all the daemons to be started.  If
+        any of them failed to start, the first error is raised.
+    :param share_helper: With the rootwrap method, start the daemons of
+        all the contexts sharing the same helper command with a single
+        helper invocation, see :func:`start_shared`.
+    :returns: A future for the start of each daemon.
+    """
+    contexts = []
+    for context in list(_CONTEXTS):
+        if not context.client_mode:
+            continue
+        if method is Method.ROOTWRAP and context.pypath is None:
+            LOG.debug('Not starting %r: pypath not set', context)
+            continue
+        contexts.append(context)
+
+    starts = []
+    if share_helper and method is Method.ROOTWRAP:
+        groups: dict[tuple[str, ...], list[PrivContext]] = {}
+        for context in contexts:
+            key = tuple(context.helper_command('')[:-4])
+            groups.setdefault(key, []).append(context)
+        for group in groups.values():
+            starts.extend(start_shared(group, wait=False))
+    else:
+        starts = [context.prestart(method) for context in contexts]
+    if wait:
+        _wait_all(starts)
+    return starts
+
+
+def start_shared(
+    contexts: list[PrivContext], wait: bool = True
+) -> list[futures.Future[None]]:
+    """Start the daemons of several contexts with a single helper command.
+
+    Rather than paying for sudo, rootwrap and a new Python interpreter for
+    each of them, a single privsep-helper process imports all the contexts
+    and then forks a daemon for each one, which shares all the imported
+    code copy-on-write and drops privileges according to its own context.
+
+    The contexts must all use the same helper command, and the deployment
+    must allow privsep-helper to be run with repeated --privsep_context and
+    --privsep_sock_path arguments.  Contexts whose daemon is already running
+    or starting are left alone.
+
+    :param contexts: The contexts to start.
+    :param wait: Whether to wait for the daemons to be started, raising the
+        error of the start if it failed.
+    :returns: A future for the start of each daemon.
+    """
+    starts = []
+    owned: list[tuple[PrivContext, futures.Future[None]]] = []
+    for context in contexts:
+        future, owner = context._begin_start()
+        starts.append(future)
+        if owner:
+            owned.append((context, future))
+
+    def run() -> None:
+        try:
+            channels = daemon.RootwrapClientChannel.start_many(
+                [context for context, _ in owned]
+            )
+        except BaseException as e:
+            for context, future in owned:
+                context._finish_start(future, e)
+            if not wait:
+                LOG.error('Failed to start privsep daemons: %s', e)
+        else:
+            for (context, future), channel in zip(owned, channels):
+                with context.start_lock:
+                    context.channel = channel
+                context._finish_start(future)
+
+    if owned:
+        if wait:
+            run()
+        else:
+            threading.Thread(
+                name='privsep_start', target=run, daemon=True
+            ).start()
+    if wait:
+        _wait_all(starts)
+    return starts
+
+
+def format_collapsed_stacks(stacks: dict[str, int]) -> str:
+    """Format the result of :meth:`PrivContext.profile` for flamegraphs.
+
+    The output can be fed directly to ``flamegraph.pl`` or speedscope.
+    """
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.items())
+
+
 class PrivContext:
     def __init__(
         self,
@@ -187,6 +409,13 @@ class PrivContext:
         self.client_mode = True
         self.channel: daemon._ClientChannel | None = None
         self.start_lock = threading.Lock()
+        # Start in progress, if any, for callers to wait on
+        self._pending_start: futures.Future[None] | None = None
+        self._pending_start_lock = threading.Lock()
+        # Hooks are stored as tuples and replaced on update, so that the
+        # call path can iterate them without locking.
+        self._pre_call_hooks: tuple[CallHook, ...] = ()
+        self._post_call_hooks: tuple[CallHook, ...] = ()
 
         cfg.CONF.register_opts(OPTS, group=cfg_section)
         cfg.CONF.set_default(
@@ -196,6 +425,7 @@ class PrivContext:
             'logger_name', group=cfg_section, default=logger_name
         )
         self.timeout = timeout
+        _CONTEXTS.add(self)
 
     @property
     def conf(self) -> Any:
@@ -258,6 +488,37 @@ class PrivContext:
     def set_client_mode(self, enabled: bool) -> None:
         self.client_mode = enabled
 
+    def add_call_hooks(
+        self,
+        pre_call: CallHook | None = None,
+        post_call: CallHook | None = None,
+    ) -> None:
+        """Register hooks run around every privileged call.
+
+        Hooks are called on the calling thread with a :class:`CallInfo`.
+        Exceptions raised by hooks are logged and otherwise ignored.
+        Calls made while no hooks are registered are not instrumented.
+        """
+        if pre_call is not None:
+            self._pre_call_hooks += (pre_call,)
+        if post_call is not None:
+            self._post_call_hooks += (post_call,)
+
+    def remove_call_hooks(
+        self,
+        pre_call: CallHook | None = None,
+        post_call: CallHook | None = None,
+    ) -> None:
+        """Unregister hooks previously passed to :meth:`add_call_hooks`."""
+        if pre_call is not None:
+            self._pre_call_hooks = tuple(
+                h for h in self._pre_call_hooks if h != pre_call
+            )
+        if post_call is not None:
+            self._post_call_hooks = tuple(
+                h for h in self._post_call_hooks if h != post_call
+            )
+
     def entrypoint(self, func: Callable[..., Any]) -> functools.partial[Any]:
         """This is intended to be used as a decorator."""
         return self._entrypoint(func)
@@ -310,19 +571,151 @@ class PrivContext:
     ) -> Any:
         if self.client_mode:
             name = f'{func.__module__}.{func.__name__}'
-            if self.channel is not None and not self.channel.running:
-                LOG.warning("RESTARTING PrivContext for %s", name)
-                self.stop()
-            if self.channel is None:
-                self.start()
-            if self.channel is None:
-                # narrow type: this will always be non-None thank to the above
-                raise RuntimeError('channel is not initialized')
+            channel = self._ensure_channel(name)
             r_call_timeout = _wrap_timeout or self.timeout
-            return self.channel.remote_call(name, args, kwargs, r_call_timeout)
+            trace = _get_trace_context()
+            if self._pre_call_hooks or self._post_call_hooks:
+                return self._instrumented_call(
+                    channel, name, args, kwargs, r_call_timeout, trace
+                )
+            options = {'trace': trace} if trace is not None else None
+            return channel.remote_call(
+                name, args, kwargs, r_call_timeout, options=options
+            )
         else:
             return func(*args, **kwargs)
 
+    def _ensure_channel(self, name: str) -> daemon._ClientChannel:
+        """Return the running channel, (re)starting the daemon if needed."""
+        if self.channel is not None and not self.channel.running:
+            LOG.warning("RESTARTING PrivContext for %s", name)
+            self.stop()
+        if self.channel is None:
+            future, owner = self._begin_start()
+            if owner:
+                self._run_start(future, Method.ROOTWRAP)
+            # Raises the error of a failed start, whichever thread ran it
+            future.result()
+        if self.channel is None:
+            # narrow type: this will always be non-None thank to the above
+            raise RuntimeError('channel is not initialized')
+        return self.channel
+
+    def _run_hooks(self, hooks: tuple[CallHook, ...], info: CallInfo) -> None:
+        for hook in hooks:
+            try:
+                hook(info)
+            except Exception:
+                LOG.exception('Error in privsep call hook %r', hook)
+
+    def _instrumented_call(
+        self,
+        channel: daemon._ClientChannel,
+        name: str,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+        timeout: float | None,
+        trace: Any = None,
+    ) -> Any:
+        info = CallInfo(self, name, trace)
+        self._run_hooks(self._pre_call_hooks, info)
+        options: dict[str, Any] = {'timing': True}
+        if trace is not None:
+            options['trace'] = trace
+        start = time.monotonic()
+        try:
+            result = channel.remote_call(
+                name, args, kwargs, timeout, info, options
+            )
+        except Exception as e:
+            info.exception = e
+            if isinstance(e, comm.PrivsepTimeout):
+                info.outcome = Outcome.TIMEOUT
+            else:
+                info.outcome = Outcome.ERROR
+            raise
+        else:
+            info.outcome = Outcome.SUCCESS
+            return result
+        finally:
+            info.elapsed = time.monotonic() - start
+            self._run_hooks(self._post_call_hooks, info)
+
+    def profile(
+        self, duration: float, interval: float = 0.01
+    ) -> dict[str, int]:
+        """Profile the privsep daemon of this context.
+
+        Samples the stacks of all the daemon threads every ``interval``
+        seconds for ``duration`` seconds.  The daemon is started if it is
+        not running yet, and keeps serving calls while being profiled.
+
+        :returns: A mapping of stacks in the "collapsed" format consumed by
+                  flamegraph tools to the number of samples of each.  See
+                  :func:`format_collapsed_stacks`.
+        """
+        if duration <= 0 or interval <= 0:
+            raise ValueError('duration and interval must be positive')
+        channel = self._ensure_channel('profile')
+        return channel.profile(duration, interval)
+
+    def _begin_start(self) -> tuple[futures.Future[None], bool]:
+        """Return the pending start, creating it if there is none.
+
+        :returns: The future of the pending start, and whether the caller
+            created it and is thus responsible for running it.
+        """
+        with self._pending_start_lock:
+            if self._pending_start is not None:
+                return self._pending_start, False
+            future: futures.Future[None] = futures.Future()
+            if self.channel is not None:
+                future.set_result(None)
+                return future, False
+            self._pending_start = future
+            return future, True
+
+    def _run_start(self, future: futures.Future[None], method: Method) -> None:
+        try:
+            self.start(method)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(None)
+        finally:
+            with self._pending_start_lock:
+                self._pending_start = None
+
+    def prestart(
+        self, method: Method = Method.ROOTWRAP
+    ) -> futures.Future[None]:
+        """Start the privsep daemon in the background.
+
+        This should be called after :func:`init`, to avoid the first
+        privileged call having to wait for the whole daemon startup.
+        Privileged calls made while the daemon is starting wait for it to
+        be ready rather than starting another one.
+
+        :param method: The method used to start the daemon.
+        :returns: A future completed once the daemon is started.
+        """
+        future, owner = self._begin_start()
+        if owner:
+
+            def run() -> None:
+                self._run_start(future, method)
+                if future.exception() is not None:
+                    LOG.error(
+                        'Failed to start privsep daemon for %r: %s',
+                        self,
+                        future.exception(),
+                    )
+
+            threading.Thread(
+                name='privsep_start', target=run, daemon=True
+            ).start()
+        return future
+
     def start(self, method: Method = Method.ROOTWRAP) -> None:
         with self.start_lock:
             if self.channel is not None:
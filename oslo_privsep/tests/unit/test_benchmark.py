@@ -0,0 +1,83 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+import json
+import platform
+from unittest import mock
+
+from oslo_config import fixture as cfg_fixture
+from oslotest import base
+import testtools
+
+from oslo_privsep.benchmark import main
+
+
+class SummarizeTest(base.BaseTestCase):
+    def test_summarize(self):
+        result = main.summarize([i / 1e6 for i in range(100, 0, -1)])
+        self.assertEqual(100, result['count'])
+        self.assertAlmostEqual(1, result['min_us'])
+        self.assertAlmostEqual(50.5, result['mean_us'])
+        self.assertAlmostEqual(51, result['p50_us'])
+        self.assertAlmostEqual(99, result['p99_us'])
+        self.assertAlmostEqual(100, result['max_us'])
+
+
+@testtools.skipIf(
+    platform.system() != 'Linux', 'works only on Linux platform.'
+)
+class BenchmarkTest(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.useFixture(cfg_fixture.Config())
+
+    def test_run(self):
+        results = main.run(
+            list(main.SCENARIOS),
+            5,
+            threads=[1, 2],
+            pool_sizes=[1],
+            payload_sizes=[1, 1024],
+        )
+
+        self.assertEqual(5, results['iterations'])
+        results = results['results']
+        self.assertEqual(set(main.SCENARIOS), set(results))
+        self.assertEqual(5, results['latency']['count'])
+        self.assertEqual(
+            [(1, 1), (1, 2)],
+            [
+                (r['thread_pool_size'], r['threads'])
+                for r in results['throughput']
+            ],
+        )
+        self.assertEqual(
+            [
+                ('request', 1),
+                ('reply', 1),
+                ('request', 1024),
+                ('reply', 1024),
+            ],
+            [(r['direction'], r['size']) for r in results['payload']],
+        )
+        self.assertIn('overhead_us', results['exception'])
+        self.assertIn('per_record_us', results['logging'])
+
+    def test_main(self):
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            main.main(['--scenario', 'latency', '--iterations', '3'])
+        results = json.loads(stdout.getvalue())
+        self.assertEqual(['latency'], list(results['results']))
+
+    def test_unknown_scenario(self):
+        self.assertRaises(ValueError, main.run, ['nope'], 1)
@@ -99,6 +99,15 @@ class TestSerialization(base.BaseTestCase):
         obj = UnknownClass()
         self.assertRaises(TypeError, self.send, obj)
 
+    def test_sizes(self):
+        size = self.input.send((1, 'foo'))
+        self.assertEqual((1, 'foo'), next(self.output))
+        self.assertEqual(size, self.output.last_size)
+
+        size = self.input.send(b'x' * 10000)
+        next(self.output)
+        self.assertEqual(size, self.output.last_size)
+
     def test_eof(self):
         self.input.close()
         self.assertRaises(StopIteration, next, self.output)
@@ -19,6 +19,7 @@ import functools
 import logging as pylogging
 import platform
 import sys
+import threading
 import time
 from unittest import mock
 
@@ -55,6 +56,9 @@ def get_fake_context(conf_attrs=None, **context_attrs):
         capabilities.CAP_NET_ADMIN,
     ]
     context.conf.logger_name = 'oslo_privsep.daemon'
+    context.conf.slow_call_threshold = None
+    context.conf.slow_call_thresholds = {}
+    context.conf.slow_call_log_interval = 60.0
     vars(context).update(context_attrs)  # type: ignore[attr-defined]
     vars(context.conf).update(conf_attrs)
     return context
@@ -79,6 +83,11 @@ def raise_runtimeerror():
     raise RuntimeError()
 
 
+@testctx.context.entrypoint
+def sleep(duration, password=None):
+    time.sleep(duration)
+
+
 class LogRecorder(pylogging.Formatter):
     def __init__(self, logs, *args, **kwargs):
         kwargs['validate'] = False
@@ -209,6 +218,26 @@ class LogTestDaemonTraceback(testctx.TestContextTestCase):
         self.assertEqual(logging.WARNING, record.levelno)
 
 
+@testtools.skipIf(
+    platform.system() != 'Linux', 'works only on Linux platform.'
+)
+class SlowCallLogTest(testctx.TestContextTestCase):
+    def setUp(self):
+        self.config_override = {'slow_call_threshold': 0.05}
+        super().setUp()
+
+    def test_slow_call_logged(self):
+        logger = self.useFixture(fixtures.FakeLogger(level=logging.INFO))
+
+        sleep(0, password='hunter2')  # noqa: S106
+        sleep(0.1, password='hunter2')  # noqa: S106
+        time.sleep(0.1)  # Hack to give logging thread a chance to run
+
+        self.assertEqual(1, logger.output.count('Slow privsep call'))
+        self.assertIn(f'{__name__}.sleep', logger.output)
+        self.assertNotIn('hunter2', logger.output)
+
+
 @testtools.skipIf(
     platform.system() != 'Linux', 'works only on Linux platform.'
 )
@@ -254,6 +283,83 @@ class DaemonTest(base.BaseTestCase):
         )
 
 
+class SampleStacksTest(base.BaseTestCase):
+    def test_sample_stacks(self):
+        event = threading.Event()
+        t = threading.Thread(name='sleeper', target=event.wait)
+        t.start()
+        self.addCleanup(t.join)
+        self.addCleanup(event.set)
+
+        stacks = daemon.sample_stacks(0.03, 0.01)
+
+        sleeper = [s for s in stacks if s.startswith('sleeper;')]
+        self.assertEqual(1, len(sleeper))
+        self.assertIn(';wait (', sleeper[0])
+        self.assertGreaterEqual(stacks[sleeper[0]], 2)
+        # The sampling thread itself is not included
+        self.assertFalse(any('sample_stacks (' in s for s in stacks))
+
+
+class SlowCallDetectorTest(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.detector = daemon._SlowCallDetector(1.0, {'foo.quick': 0}, 60)
+        self.mock_warning = self.useFixture(
+            fixtures.MockPatchObject(daemon.LOG, 'warning')
+        ).mock
+
+    def test_enabled(self):
+        self.assertTrue(self.detector.enabled)
+        self.assertFalse(daemon._SlowCallDetector(None, {}, 60).enabled)
+        self.assertTrue(daemon._SlowCallDetector(None, {'a': 1}, 60).enabled)
+
+    def test_below_threshold(self):
+        self.detector.check('foo.bar', (), {}, 0.1, 0.5)
+        self.mock_warning.assert_not_called()
+
+    def test_above_threshold(self):
+        self.detector.check('foo.bar', ('eth0',), {'up': True}, 0.1, 1.5)
+        self.mock_warning.assert_called_once()
+        params = self.mock_warning.call_args[0][1]
+        self.assertEqual('foo.bar', params['name'])
+        self.assertEqual(1.5, params['run'])
+        self.assertEqual(0.1, params['wait'])
+        self.assertEqual(0, params['suppressed'])
+        self.assertIn("'eth0'", params['summary'])
+        self.assertIn("'up': True", params['summary'])
+
+    def test_override(self):
+        self.detector.check('foo.quick', (), {}, 0, 100)
+        self.mock_warning.assert_not_called()
+
+        detector = daemon._SlowCallDetector(None, {'foo.slow': 5.0}, 60)
+        detector.check('foo.slow', (), {}, 0, 4)
+        detector.check('foo.other', (), {}, 0, 100)
+        self.mock_warning.assert_not_called()
+        detector.check('foo.slow', (), {}, 0, 6)
+        self.mock_warning.assert_called_once()
+
+    def test_rate_limited(self):
+        for _ in range(3):
+            self.detector.check('foo.bar', (), {}, 0, 2)
+        self.detector.check('foo.baz', (), {}, 0, 2)
+        self.assertEqual(2, self.mock_warning.call_count)
+
+        self.detector.interval = 0
+        self.detector.check('foo.bar', (), {}, 0, 2)
+        self.assertEqual(2, self.mock_warning.call_args[0][1]['suppressed'])
+
+    def test_summary_redacted_and_truncated(self):
+        summary = self.detector.summarize(
+            ('x' * 1000, '--password=hunter2'),
+            {'password': 'hunter2', 'data': list(range(1000))},
+        )
+        self.assertNotIn('hunter2', summary)
+        self.assertNotIn('x' * 100, summary)
+        self.assertLess(len(summary), 400)
+
+
 @testtools.skipIf(
     platform.system() != 'Linux', 'works only on Linux platform.'
 )
@@ -17,11 +17,15 @@ import logging
 import os
 import platform
 import shlex
+import subprocess
 import sys
 import tempfile
+import threading
 import time
 from unittest import mock
 
+import fixtures
+from oslotest import base
 import testtools
 
 from oslo_privsep import comm
@@ -31,17 +35,34 @@ from oslo_privsep.tests import testctx
 
 LOG = logging.getLogger(__name__)
 
+shared_context = priv_context.PrivContext(
+    __name__,
+    cfg_section='privsep_shared',
+    pypath=__name__ + '.shared_context',
+    capabilities=[],
+)
+
 
 @testctx.context.entrypoint
 def priv_getpid():
     return os.getpid()
 
 
+@shared_context.entrypoint
+def shared_getpid():
+    return os.getpid()
+
+
 @testctx.context.entrypoint
 def add1(arg):
     return arg + 1
 
 
+@testctx.context.entrypoint
+def trace_context():
+    return daemon.get_trace_context()
+
+
 @testctx.context.entrypoint_with_timeout(0.2)
 def do_some_long(long_timeout=0.4):
     time.sleep(long_timeout)
@@ -177,25 +198,28 @@ class SeparationTest(testctx.TestContextTestCase):
 @testtools.skipIf(
     platform.system() != 'Linux', 'works only on Linux platform.'
 )
+def helper_command():
+    # Generate a command that will run daemon.helper_main without
+    # requiring it to be properly installed.
+    cmd = [
+        'env',
+        f'PYTHON_PATH={os.path.pathsep.join(sys.path)}',
+        sys.executable,
+        daemon.__file__,
+    ]
+    if LOG.isEnabledFor(logging.DEBUG):
+        cmd.append('--debug')
+    return ' '.join(map(shlex.quote, cmd))
+
+
 class RootwrapTest(testctx.TestContextTestCase):
     def setUp(self):
         super().setUp()
         testctx.context.stop()
 
-        # Generate a command that will run daemon.helper_main without
-        # requiring it to be properly installed.
-        cmd = [
-            'env',
-            f'PYTHON_PATH={os.path.pathsep.join(sys.path)}',
-            sys.executable,
-            daemon.__file__,
-        ]
-        if LOG.isEnabledFor(logging.DEBUG):
-            cmd.append('--debug')
-
         self.privsep_conf.set_override(
             'helper_command',
-            ' '.join(map(shlex.quote, cmd)),
+            helper_command(),
             group=testctx.context.cfg_section,
         )
 
@@ -214,6 +238,67 @@ class RootwrapTest(testctx.TestContextTestCase):
         self.assertEqual(42, res)
 
 
+@testtools.skipIf(
+    platform.system() != 'Linux', 'works only on Linux platform.'
+)
+class SharedHelperTest(testctx.TestContextTestCase):
+    def setUp(self):
+        super().setUp()
+        testctx.context.stop()
+        self.addCleanup(shared_context.stop)
+
+        for section in (testctx.context.cfg_section, 'privsep_shared'):
+            self.privsep_conf.set_override(
+                'helper_command', helper_command(), group=section
+            )
+
+    def test_start_shared(self):
+        with mock.patch.object(
+            daemon.subprocess, 'Popen', wraps=subprocess.Popen
+        ) as mock_popen:
+            priv_context.start_shared([testctx.context, shared_context])
+
+        mock_popen.assert_called_once()
+        cmd = mock_popen.call_args[0][0]
+        self.assertEqual(2, cmd.count('--privsep_context'))
+        self.assertEqual(2, cmd.count('--privsep_sock_path'))
+
+        priv_pid = priv_getpid()
+        shared_pid = shared_getpid()
+        self.assertNotMyPid(priv_pid)
+        self.assertNotMyPid(shared_pid)
+        self.assertNotEqual(priv_pid, shared_pid)
+
+    def test_start_all_share_helper(self):
+        self.useFixture(
+            fixtures.MockPatch(
+                'oslo_privsep.priv_context._CONTEXTS',
+                [testctx.context, shared_context],
+            )
+        )
+        with mock.patch.object(
+            daemon.subprocess, 'Popen', wraps=subprocess.Popen
+        ) as mock_popen:
+            priv_context.start_all(share_helper=True)
+
+        mock_popen.assert_called_once()
+        self.assertNotMyPid(shared_getpid())
+
+    def test_different_helper_command(self):
+        self.privsep_conf.set_override(
+            'helper_command', 'sudo other-helper', group='privsep_shared'
+        )
+        with mock.patch.object(daemon.subprocess, 'Popen') as mock_popen:
+            self.assertRaises(
+                ValueError,
+                priv_context.start_shared,
+                [testctx.context, shared_context],
+            )
+        mock_popen.assert_not_called()
+        self.assertIsNone(testctx.context.channel)
+        self.assertIsNone(shared_context.channel)
+
+
 @testtools.skipIf(
     platform.system() != 'Linux', 'works only on Linux platform.'
 )
@@ -230,3 +315,293 @@ class SerializationTest(testctx.TestContextTestCase):
         exc = self.assertRaises(CustomError, fail, custom=True)
         self.assertEqual(exc.code, 42)
         self.assertEqual(exc.msg, 'omg!')
+
+
+@testtools.skipIf(
+    platform.system() != 'Linux', 'works only on Linux platform.'
+)
+class CallHooksTest(testctx.TestContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pre_calls: list[priv_context.CallInfo] = []
+        self.post_calls: list[priv_context.CallInfo] = []
+        testctx.context.add_call_hooks(
+            pre_call=self.pre_calls.append, post_call=self.post_calls.append
+        )
+        self.addCleanup(
+            testctx.context.remove_call_hooks,
+            pre_call=self.pre_calls.append,
+            post_call=self.post_calls.append,
+        )
+
+    def test_success(self):
+        self.assertEqual(43, add1(42))
+
+        self.assertEqual(1, len(self.pre_calls))
+        self.assertEqual(1, len(self.post_calls))
+        info = self.post_calls[0]
+        self.assertIs(self.pre_calls[0], info)
+        self.assertEqual(f'{__name__}.add1', info.name)
+        self.assertIs(testctx.context, info.context)
+        self.assertEqual(priv_context.Outcome.SUCCESS, info.outcome)
+        self.assertIsNone(info.exception)
+        self.assertGreater(info.elapsed, 0)
+        self.assertGreater(info.request_size, 0)
+        self.assertGreater(info.reply_size, 0)
+        self.assertIsNone(info.trace_context)
+        phases = info.daemon_phases
+        self.assertEqual(
+            ['dequeued', 'executed', 'received', 'replied'], sorted(phases)
+        )
+        self.assertLessEqual(phases['received'], phases['dequeued'])
+        self.assertLessEqual(phases['dequeued'], phases['executed'])
+        self.assertLessEqual(phases['executed'], phases['replied'])
+
+    def test_error(self):
+        self.assertRaises(RuntimeError, fail)
+
+        info = self.post_calls[0]
+        self.assertEqual(priv_context.Outcome.ERROR, info.outcome)
+        self.assertIsInstance(info.exception, RuntimeError)
+        self.assertIn('executed', info.daemon_phases)
+
+    def test_trace_context(self):
+        self.addCleanup(priv_context.set_trace_provider, None)
+        priv_context.set_trace_provider(lambda: {'traceparent': '00-abc'})
+
+        self.assertEqual({'traceparent': '00-abc'}, trace_context())
+        self.assertEqual(
+            {'traceparent': '00-abc'}, self.post_calls[0].trace_context
+        )
+
+    def test_hook_error_ignored(self):
+        hook = mock.Mock(side_effect=ValueError)
+        testctx.context.add_call_hooks(pre_call=hook, post_call=hook)
+        self.addCleanup(
+            testctx.context.remove_call_hooks, pre_call=hook, post_call=hook
+        )
+
+        self.assertEqual(43, add1(42))
+        self.assertEqual(2, hook.call_count)
+
+    def test_remove_hooks(self):
+        testctx.context.remove_call_hooks(
+            pre_call=self.pre_calls.append, post_call=self.post_calls.append
+        )
+
+        self.assertEqual(43, add1(42))
+        self.assertEqual([], self.pre_calls)
+        self.assertEqual([], self.post_calls)
+
+    @mock.patch.object(priv_context.PrivContext, '_instrumented_call')
+    def test_no_hooks_not_instrumented(self, mock_instrumented):
+        context = priv_context.PrivContext('test', capabilities=[])
+        context.channel = mock.Mock()
+
+        context._wrap(len, 'foo')
+
+        mock_instrumented.assert_not_called()
+        context.channel.remote_call.assert_called_once_with(
+            'builtins.len', ('foo',), {}, None, options=None
+        )
+
+
+@testtools.skipIf(
+    platform.system() != 'Linux', 'works only on Linux platform.'
+)
+class TraceContextTest(testctx.TestContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(priv_context.set_trace_provider, None)
+
+    def test_no_provider(self):
+        self.assertIsNone(trace_context())
+
+    def test_provider(self):
+        priv_context.set_trace_provider(lambda: 'span-1')
+        self.assertEqual('span-1', trace_context())
+
+    def test_provider_error(self):
+        priv_context.set_trace_provider(mock.Mock(side_effect=ValueError))
+        self.assertIsNone(trace_context())
+
+
+@testtools.skipIf(
+    platform.system() != 'Linux', 'works only on Linux platform.'
+)
+class ProfileTest(testctx.TestContextTestCase):
+    def test_profile(self):
+        stacks = testctx.context.profile(0.05, interval=0.01)
+
+        self.assertIsInstance(stacks, dict)
+        self.assertTrue(any('loop (' in stack for stack in stacks))
+        self.assertTrue(all(count > 0 for count in stacks.values()))
+
+    def test_profile_busy_workers(self):
+        # Occupy a worker for the whole duration of the profile.
+        t = threading.Thread(target=do_some_long, args=(0.15,))
+        t.start()
+        self.addCleanup(t.join)
+        time.sleep(0.02)
+
+        stacks = testctx.context.profile(0.05, interval=0.01)
+        self.assertTrue(any('do_some_long (' in stack for stack in stacks))
+
+    def test_profile_invalid(self):
+        self.assertRaises(ValueError, testctx.context.profile, 0)
+        self.assertRaises(ValueError, testctx.context.profile, 1, -1)
+
+    def test_format_collapsed_stacks(self):
+        self.assertEqual(
+            'MainThread;a (x.py:1);b (x.py:2) 3\nMainThread;a (x.py:1) 1\n',
+            priv_context.format_collapsed_stacks(
+                {
+                    'MainThread;a (x.py:1);b (x.py:2)': 3,
+                    'MainThread;a (x.py:1)': 1,
+                }
+            ),
+        )
+
+
+@testtools.skipIf(
+    platform.system() != 'Linux', 'works only on Linux platform.'
+)
+class PrestartTest(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.context = priv_context.PrivContext('test', capabilities=[])
+        self.release = threading.Event()
+        self.start = self.useFixture(
+            fixtures.MockPatchObject(
+                priv_context.PrivContext, 'start', autospec=True
+            )
+        ).mock
+        self.start.side_effect = self._start
+
+    def _start(self, context, method=priv_context.Method.ROOTWRAP):
+        self.release.wait()
+        context.channel = mock.Mock()
+
+    def _call_in_threads(self, count):
+        errors = []
+
+        def call():
+            try:
+                self.context._wrap(len, 'foo')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for t in threads:
+            t.start()
+        return threads, errors
+
+    def test_prestart(self):
+        future = self.context.prestart(priv_context.Method.FORK)
+        threads, errors = self._call_in_threads(3)
+        self.assertFalse(future.done())
+
+        self.release.set()
+        future.result()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([], errors)
+        self.start.assert_called_once_with(
+            self.context, priv_context.Method.FORK
+        )
+        channel = self.context.channel
+        assert isinstance(channel, mock.Mock)
+        self.assertEqual(3, channel.remote_call.call_count)
+
+    def test_prestart_running(self):
+        self.context.channel = mock.Mock()
+        self.context.prestart().result()
+        self.start.assert_not_called()
+
+    def test_concurrent_first_calls_share_start(self):
+        threads, errors = self._call_in_threads(5)
+        time.sleep(0.05)
+        self.release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(1, self.start.call_count)
+
+    def test_failed_start_shared(self):
+        error = daemon.FailedToDropPrivileges('boom')
+
+        def fail(context, method):
+            self.release.wait()
+            raise error
+
+        self.start.side_effect = fail
+        future = self.context.prestart()
+        threads, errors = self._call_in_threads(3)
+        self.release.set()
+        for t in threads:
+            t.join()
+
+        self.assertIs(error, future.exception())
+        self.assertEqual([error] * 3, errors)
+        self.assertEqual(1, self.start.call_count)
+
+        # A later call tries again
+        self.start.side_effect = self._start
+        self.context._wrap(len, 'foo')
+        self.assertEqual(2, self.start.call_count)
+
+    def test_start_all(self):
+        self.release.set()
+        with_pypath = priv_context.PrivContext(
+            'test', pypath='test.ctx', capabilities=[]
+        )
+        not_client = priv_context.PrivContext(
+            'test', pypath='test.ctx2', capabilities=[]
+        )
+        not_client.set_client_mode(False)
+        self.useFixture(
+            fixtures.MockPatch(
+                'oslo_privsep.priv_context._CONTEXTS',
+                [self.context, with_pypath, not_client],
+            )
+        )
+
+        starts = priv_context.start_all()
+
+        self.assertEqual(1, len(starts))
+        self.start.assert_called_once_with(
+            with_pypath, priv_context.Method.ROOTWRAP
+        )
+        self.assertIsNotNone(with_pypath.channel)
+
+        starts = priv_context.start_all(priv_context.Method.FORK)
+        self.assertEqual(2, len(starts))
+        self.assertIsNotNone(self.context.channel)
+
+    def test_start_all_error(self):
+        def fail(context, method):
+            raise daemon.FailedToDropPrivileges('boom')
+
+        self.start.side_effect = fail
+        self.useFixture(
+            fixtures.MockPatch(
+                'oslo_privsep.priv_context._CONTEXTS', [self.context]
+            )
+        )
+        self.assertRaises(
+            daemon.FailedToDropPrivileges,
+            priv_context.start_all,
+            priv_context.Method.FORK,
+        )
+
+
+@testtools.skipIf(
+    platform.system() != 'Linux', 'works only on Linux platform.'
+)
+class PrestartForkTest(testctx.TestContextTestCase):
+    def test_prestart(self):
+        testctx.context.stop()
+        testctx.context.prestart(priv_context.Method.FORK).result()
+        self.assertNotMyPid(priv_getpid())